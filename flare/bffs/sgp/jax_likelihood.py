@@ -0,0 +1,120 @@
+"""
+JAX implementation of the sparse GP log marginal likelihood, used by
+optimize_hyperparameters when backend="jax". The likelihood gradient is
+obtained by automatic differentiation, and the whole BFGS loop is compiled
+with XLA, so the optimizer does not call back into C++ on each iteration.
+
+Only dot product kernels are supported. Their Kuu and Kuf matrices scale as
+sigma^2, so the kernel matrices are taken once from the C++ sparse GP and
+rescaled inside the likelihood.
+
+The likelihood needs double precision. Functions in this module must be
+called inside jax.experimental.enable_x64(), which optimize_hyperparameters_jax
+does, so the process-wide JAX setting is left unchanged.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+import jax
+import jax.numpy as jnp
+import jax.scipy as jsp
+from jax.experimental import enable_x64
+
+from ._C_flare import NormalizedDotProduct, DotProduct
+
+
+def get_likelihood_inputs(sparse_gp):
+    """Collect the arrays needed to evaluate the likelihood from a C++
+    sparse GP."""
+
+    kernel_index = []
+    for k, kern in enumerate(sparse_gp.kernels):
+        if not isinstance(kern, (NormalizedDotProduct, DotProduct)):
+            raise NotImplementedError(
+                "The JAX backend only supports dot product kernels"
+            )
+        kernel_index += [k] * sparse_gp.Kuu_kernels[k].shape[0]
+
+    # Kuu and Kuf were computed at the current hyperparameters of the sparse
+    # GP. The kernel objects may be shared with other models, so their sigma
+    # is not used.
+    sigma_ref = np.array(sparse_gp.hyperparameters[: len(sparse_gp.kernels)])
+
+    return {
+        "Kuu": jnp.asarray(sparse_gp.Kuu),
+        "Kuf": jnp.asarray(sparse_gp.Kuf),
+        "y": jnp.asarray(sparse_gp.y),
+        "e_noise_one": jnp.asarray(sparse_gp.e_noise_one),
+        "f_noise_one": jnp.asarray(sparse_gp.f_noise_one),
+        "s_noise_one": jnp.asarray(sparse_gp.s_noise_one),
+        "kernel_index": jnp.asarray(kernel_index, dtype=jnp.int32),
+        "sigma_ref": jnp.asarray(sigma_ref),
+        "Kuu_jitter": sparse_gp.Kuu_jitter,
+    }
+
+
+def negative_likelihood(hyperparameters, inputs):
+    """Negative DTC log marginal likelihood, evaluated in O(N_full * N_sparse^2)
+    with the matrix determinant lemma and the Woodbury identity."""
+
+    n_kernels = inputs["sigma_ref"].shape[0]
+    sigmas = hyperparameters[:n_kernels]
+    sigma_e, sigma_f, sigma_s = hyperparameters[n_kernels:]
+
+    # Rescale the kernel matrices to the new signal variances.
+    scale = (sigmas / inputs["sigma_ref"])[inputs["kernel_index"]]
+    Kuu = inputs["Kuu"] * jnp.outer(scale, scale)
+    Kuu = Kuu + inputs["Kuu_jitter"] * jnp.eye(Kuu.shape[0])
+    Kuf = inputs["Kuf"] * (scale * scale)[:, None]
+
+    # Inverse noise of each label.
+    noise = (
+        inputs["e_noise_one"] / (sigma_e * sigma_e)
+        + inputs["f_noise_one"] / (sigma_f * sigma_f)
+        + inputs["s_noise_one"] / (sigma_s * sigma_s)
+    )
+    y = inputs["y"]
+
+    L = jnp.linalg.cholesky(Kuu)
+    B = jsp.linalg.solve_triangular(L, Kuf, lower=True)
+    A = jnp.eye(Kuu.shape[0]) + (B * noise) @ B.T
+    L_A = jnp.linalg.cholesky(A)
+    c = jsp.linalg.solve_triangular(L_A, B @ (noise * y), lower=True)
+
+    log_det = 2 * jnp.sum(jnp.log(jnp.diag(L_A))) - jnp.sum(jnp.log(noise))
+    data_fit = jnp.dot(y, noise * y) - jnp.dot(c, c)
+    constant_term = y.shape[0] * jnp.log(2 * jnp.pi)
+
+    return (log_det + data_fit + constant_term) / 2
+
+
+def optimize_hyperparameters_jax(
+    sparse_gp, initial_guesses, gradient_tolerance=1e-4, max_iterations=10
+):
+    """Run BFGS from each initial guess in parallel with jax.vmap, and return
+    the result with the lowest negative likelihood."""
+
+    with enable_x64():
+        inputs = get_likelihood_inputs(sparse_gp)
+
+        @jax.jit
+        def run(x0):
+            return jax.scipy.optimize.minimize(
+                negative_likelihood,
+                x0,
+                args=(inputs,),
+                method="BFGS",
+                options={"maxiter": max_iterations, "gtol": gradient_tolerance},
+            )
+
+        results = jax.vmap(run)(jnp.asarray(np.array(initial_guesses)))
+        best = int(jnp.argmin(results.fun))
+
+        return OptimizeResult(
+            x=np.asarray(results.x[best]),
+            fun=float(results.fun[best]),
+            jac=np.asarray(results.jac[best]),
+            nit=int(results.nit[best]),
+            nfev=int(results.nfev[best]),
+            success=bool(results.success[best]),
+        )
@@ -1,7 +1,11 @@
 import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from time import time
 import numpy as np
-from scipy.optimize import minimize
+from scipy.optimize import minimize, OptimizeResult
+from numba import njit
 from typing import List
 import warnings
 from ase import Atoms
@@ -13,6 +17,11 @@ try:
 except Exception as e:
     warnings.warn(f"Cannot import _C_flare: {e.__class__.__name__}: {e}")
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of likelihood evaluations kept in a cross-call cache.
+likelihood_cache_size = 16
+
 
 class SGP_Wrapper:
     """Wrapper class used to make the C++ sparse GP object compatible with
@@ -33,11 +42,13 @@ class SGP_Wrapper:
         force_training=True,
         stress_training=True,
         max_iterations=10,
-        opt_method="BFGS",
+        opt_method="L-BFGS-B",
         bounds=None,
+        stable=True,
     ):
 
         self.sparse_gp = SparseGP(kernels, sigma_e, sigma_f, sigma_s)
+        self._n_hyps = len(self.sparse_gp.hyperparameters)
         self.descriptor_calculators = descriptor_calculators
         self.cutoff = cutoff
         self.hyps_mask = None
@@ -50,13 +61,27 @@ class SGP_Wrapper:
         self.max_iterations = max_iterations
         self.opt_method = opt_method
         self.bounds = bounds
+        self.stable = stable
         self.atom_indices = []
         self.rel_efs_noise = []
+        self._likelihood_cache = OrderedDict()
+
+        # Lookup tables from atomic numbers to coded species, and from coded
+        # species to single atom energies (zero if not given), used to avoid
+        # per-atom dict lookups.
+        self._species_lut = np.full(max(species_map) + 1, -1, dtype=np.int32)
+        self._species_lut[list(species_map.keys())] = list(species_map.values())
+        n_coded = max(species_map.values()) + 1
+        if single_atom_energies is not None:
+            n_coded = max(n_coded, max(single_atom_energies) + 1)
+        self._single_atom_lut = np.zeros(n_coded, dtype=np.float64)
+        if single_atom_energies is not None:
+            self._single_atom_lut[list(single_atom_energies.keys())] = list(
+                single_atom_energies.values()
+            )
 
         # Make placeholder hyperparameter labels.
-        self.hyp_labels = []
-        for n in range(len(self.hyps)):
-            self.hyp_labels.append("Hyp" + str(n))
+        self.hyp_labels = [f"Hyp{n}" for n in range(self._n_hyps)]
 
         # prepare a new sGP for variance mapping
         self.sgp_var = None
@@ -80,6 +105,7 @@ class SGP_Wrapper:
 
     @property
     def hyps(self):
+        # Read-only view of the C++ hyperparameter vector (no copy).
         return self.sparse_gp.hyperparameters
 
     @property
@@ -100,7 +126,7 @@ class SGP_Wrapper:
 
     def __str__(self):
         gp_str = ""
-        gp_str += f"Number of hyperparameters: {len(self.hyps)}\n"
+        gp_str += f"Number of hyperparameters: {self._n_hyps}\n"
         gp_str += f"Hyperparameter array: {str(self.hyps)}\n"
 
         if self.hyp_labels is None:
@@ -136,7 +162,15 @@ class SGP_Wrapper:
     def as_dict(self):
         out_dict = {}
         for key in vars(self):
-            if key not in ["sparse_gp", "sgp_var", "descriptor_calculators"]:
+            if key not in [
+                "sparse_gp",
+                "sgp_var",
+                "descriptor_calculators",
+                "_n_hyps",
+                "_likelihood_cache",
+                "_species_lut",
+                "_single_atom_lut",
+            ]:
                 out_dict[key] = getattr(self, key, None)
 
         # save descriptor_settings
@@ -267,6 +301,7 @@ class SGP_Wrapper:
             max_iterations=in_dict["max_iterations"],
             opt_method=in_dict["opt_method"],
             bounds=in_dict["bounds"],
+            stable=in_dict.get("stable", True),
         )
         gp.sparse_gp.Kuu_jitter = in_dict["Kuu_jitter"]
 
@@ -288,22 +323,20 @@ class SGP_Wrapper:
             rel_efs_noise = train_struc.info.get("rel_efs_noise", [1, 1, 1])
             rel_e_noise, rel_f_noise, rel_s_noise = rel_efs_noise
 
-            gp.update_db(
+            gp.stage_structure(
                 train_struc,
                 train_struc.forces,
                 custom_range=custom_range,
                 energy=energy,
                 stress=train_struc.stress,
                 mode="specific",
-                sgp=None,
-                update_qr=False,
                 atom_indices=atom_indices,
                 rel_e_noise=rel_e_noise,
                 rel_f_noise=rel_f_noise,
                 rel_s_noise=rel_s_noise,
             )
 
-        gp.sparse_gp.update_matrices_QR()
+        gp.flush()
         return gp, kernels
 
     @staticmethod
@@ -312,29 +345,27 @@ class SGP_Wrapper:
             in_dict = json.loads(f.readline())
         return SGP_Wrapper.from_dict(in_dict)
 
-    def update_db(
+    def build_structure_descriptor(
         self,
         structure,
         forces,
-        custom_range=(),
         energy: float = None,
         stress: "ndarray" = None,
-        mode: str = "specific",
-        sgp=None,  # for creating sgp_var
-        update_qr=True,
-        atom_indices=[-1],
-        rel_e_noise: float = 1,
-        rel_f_noise: float = 1,
-        rel_s_noise: float = 1,
     ):
+        """Convert a structure and its labels to a C++ structure descriptor."""
 
         # Convert coded species to 0, 1, 2, etc.
         if isinstance(structure, (Atoms, FLARE_Atoms)):
-            coded_species = []
-            for spec in structure.numbers:
-                coded_species.append(self.species_map[spec])
+            coded_species, single_atom_sum = preprocess_species(
+                structure.numbers, self._species_lut, self._single_atom_lut
+            )
         elif isinstance(structure, Structure):
-            coded_species = structure.species
+            coded_species = np.asarray(structure.species, dtype=np.int32)
+            if (coded_species < 0).any() or (
+                coded_species >= self._single_atom_lut.size
+            ).any():
+                raise ValueError("Coded species out of range of species_map")
+            single_atom_sum = float(self._single_atom_lut[coded_species].sum())
         else:
             raise Exception
 
@@ -349,26 +380,41 @@ class SGP_Wrapper:
 
         # Add labels to structure descriptor.
         if (energy is not None) and (self.energy_training):
-            # Sum up single atom energies.
-            single_atom_sum = 0
-            if self.single_atom_energies is not None:
-                for spec in coded_species:
-                    single_atom_sum += self.single_atom_energies[spec]
-
             # Correct the energy label and assign to structure.
             corrected_energy = energy - single_atom_sum
             structure_descriptor.energy = np.array([[corrected_energy]])
 
         if (forces is not None) and (self.force_training):
-            structure_descriptor.forces = forces.reshape(-1)
+            structure_descriptor.forces = np.ascontiguousarray(
+                forces, dtype=np.float64
+            ).ravel()
 
         if (stress is not None) and (self.stress_training):
-            structure_descriptor.stresses = stress
+            structure_descriptor.stresses = np.ascontiguousarray(
+                stress, dtype=np.float64
+            )
+
+        return structure_descriptor
+
+    def add_structure_descriptor(
+        self,
+        structure_descriptor,
+        custom_range=(),
+        mode: str = "specific",
+        sgp=None,
+        atom_indices=[-1],
+        rel_e_noise: float = 1,
+        rel_f_noise: float = 1,
+        rel_s_noise: float = 1,
+    ):
+        """Add a structure descriptor and its sparse environments to the
+        sparse GP, without updating the QR factorization."""
 
         # Update the sparse GP.
         if sgp is None:
             sgp = self.sparse_gp
             self.atom_indices.append(atom_indices)
+            self._likelihood_cache.clear()
 
         sgp.add_training_structure(
             structure_descriptor, atom_indices, rel_e_noise, rel_f_noise, rel_s_noise
@@ -405,19 +451,139 @@ class SGP_Wrapper:
         else:
             raise NotImplementedError
 
+    def stage_structure(
+        self,
+        structure,
+        forces,
+        custom_range=(),
+        energy: float = None,
+        stress: "ndarray" = None,
+        mode: str = "specific",
+        sgp=None,
+        atom_indices=[-1],
+        rel_e_noise: float = 1,
+        rel_f_noise: float = 1,
+        rel_s_noise: float = 1,
+    ):
+        """Add a structure to the training set without updating the QR
+        factorization. Call flush once all structures have been staged."""
+
+        structure_descriptor = self.build_structure_descriptor(
+            structure, forces, energy=energy, stress=stress
+        )
+        self.add_structure_descriptor(
+            structure_descriptor,
+            custom_range=custom_range,
+            mode=mode,
+            sgp=sgp,
+            atom_indices=atom_indices,
+            rel_e_noise=rel_e_noise,
+            rel_f_noise=rel_f_noise,
+            rel_s_noise=rel_s_noise,
+        )
+
+    def flush(self):
+        """Update the QR factorization after structures have been staged."""
+        self.sparse_gp.update_matrices_QR()
+
+    def update_db(
+        self,
+        structure,
+        forces,
+        custom_range=(),
+        energy: float = None,
+        stress: "ndarray" = None,
+        mode: str = "specific",
+        sgp=None,  # for creating sgp_var
+        update_qr=True,
+        atom_indices=[-1],
+        rel_e_noise: float = 1,
+        rel_f_noise: float = 1,
+        rel_s_noise: float = 1,
+    ):
+
+        self.stage_structure(
+            structure,
+            forces,
+            custom_range=custom_range,
+            energy=energy,
+            stress=stress,
+            mode=mode,
+            sgp=sgp,
+            atom_indices=atom_indices,
+            rel_e_noise=rel_e_noise,
+            rel_f_noise=rel_f_noise,
+            rel_s_noise=rel_s_noise,
+        )
+
+        # When a single structure is added without new sparse environments,
+        # only rows are appended to the QR system, which is rotated into the
+        # existing factorization. Otherwise this falls back to a full update.
         if update_qr:
-            sgp.update_matrices_QR()
+            if sgp is None:
+                sgp = self.sparse_gp
+            sgp.update_matrices_QR_append()
+
+    def update_db_batch(
+        self,
+        structures,
+        forces_list,
+        energies=None,
+        stresses=None,
+        mode: str = "all",
+        custom_ranges=None,
+        max_workers=4,
+    ):
+        """Add a batch of structures to the training set. The structure
+        descriptors are computed in parallel threads, since the C++
+        descriptor calculation releases the GIL. Structures are then added to
+        the sparse GP in order, followed by a single QR update.
+
+        Each descriptor calculation also runs OpenMP loops, so the total
+        thread count is max_workers times OMP_NUM_THREADS. To use one thread
+        per core, set OMP_NUM_THREADS=1 and max_workers to the number of
+        cores."""
+
+        n_strucs = len(structures)
+        if energies is None:
+            energies = [None] * n_strucs
+        if stresses is None:
+            stresses = [None] * n_strucs
+        if custom_ranges is None:
+            custom_ranges = [()] * n_strucs
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            structure_descriptors = list(
+                executor.map(
+                    self.build_structure_descriptor,
+                    structures,
+                    forces_list,
+                    energies,
+                    stresses,
+                )
+            )
+
+        for structure_descriptor, custom_range in zip(
+            structure_descriptors, custom_ranges
+        ):
+            self.add_structure_descriptor(
+                structure_descriptor, custom_range=custom_range, mode=mode
+            )
+
+        self.flush()
 
     def set_L_alpha(self):
         # Taken care of in the update_db method.
         pass
 
-    def train(self, logger_name=None):
-        optimize_hyperparameters(
+    def train(self, logger_name=None, gradient_tolerance=1e-4):
+        return optimize_hyperparameters(
             self.sparse_gp,
+            gradient_tolerance=gradient_tolerance,
             max_iterations=self.max_iterations,
             method=self.opt_method,
             bounds=self.bounds,
+            stable=self.stable,
+            likelihood_cache=self._likelihood_cache,
         )
 
     def write_mapping_coefficients(self, filename, contributor, kernel_idx):
@@ -553,6 +719,25 @@ class SGP_Wrapper:
         return new_gp, kernels
 
 
+@njit(cache=True)
+def preprocess_species(numbers, species_lut, single_atom_lut):
+    """Map atomic numbers to coded species and sum the single atom energies
+    in a single pass."""
+
+    coded_species = np.empty(numbers.size, dtype=np.int32)
+    single_atom_sum = 0.0
+    for i in range(numbers.size):
+        if numbers[i] < 0 or numbers[i] >= species_lut.size:
+            raise ValueError("Atomic number not in species_map")
+        coded = species_lut[numbers[i]]
+        if coded < 0:
+            raise ValueError("Atomic number not in species_map")
+        coded_species[i] = coded
+        single_atom_sum += single_atom_lut[coded]
+
+    return coded_species, single_atom_sum
+
+
 def compute_negative_likelihood(hyperparameters, sparse_gp, print_vals=False):
     """Compute the negative log likelihood and gradient with respect to the
     hyperparameters."""
@@ -563,7 +748,7 @@ def compute_negative_likelihood(hyperparameters, sparse_gp, print_vals=False):
     sparse_gp.compute_likelihood()
     negative_likelihood = -sparse_gp.log_marginal_likelihood
 
-    if print_vals:
+    if print_vals and logger.isEnabledFor(logging.DEBUG):
         print_hyps(hyperparameters, negative_likelihood)
 
     return negative_likelihood
@@ -578,7 +763,7 @@ def compute_negative_likelihood_grad(hyperparameters, sparse_gp, print_vals=Fals
     negative_likelihood = -sparse_gp.compute_likelihood_gradient(hyperparameters)
     negative_likelihood_gradient = -sparse_gp.likelihood_gradient
 
-    if print_vals:
+    if print_vals and logger.isEnabledFor(logging.DEBUG):
         print_hyps_and_grad(
             hyperparameters, negative_likelihood_gradient, negative_likelihood
         )
@@ -599,29 +784,44 @@ def compute_negative_likelihood_grad_stable(
     negative_likelihood = -sparse_gp.compute_likelihood_gradient_stable(precomputed)
     negative_likelihood_gradient = -sparse_gp.likelihood_gradient
 
-    print_hyps_and_grad(
-        hyperparameters, negative_likelihood_gradient, negative_likelihood
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        print_hyps_and_grad(
+            hyperparameters, negative_likelihood_gradient, negative_likelihood
+        )
 
     return negative_likelihood, negative_likelihood_gradient
 
 
 def print_hyps(hyperparameters, neglike):
-    print("Hyperparameters:")
-    print(hyperparameters)
-    print("Likelihood:")
-    print(-neglike)
-    print("\n")
+    logger.debug("Hyperparameters:\n%s\nLikelihood:\n%s\n", hyperparameters, -neglike)
 
 
 def print_hyps_and_grad(hyperparameters, neglike_grad, neglike):
-    print("Hyperparameters:")
-    print(hyperparameters)
-    print("Likelihood gradient:")
-    print(-neglike_grad)
-    print("Likelihood:")
-    print(-neglike)
-    print("\n")
+    logger.debug(
+        "Hyperparameters:\n%s\nLikelihood gradient:\n%s\nLikelihood:\n%s\n",
+        hyperparameters,
+        -neglike_grad,
+        -neglike,
+    )
+
+
+def perturb_hyperparameters(hyperparameters, bounds=None, scale=1.0, rng=None):
+    """Return a log-uniform random perturbation of the hyperparameters,
+    clipped to the optimizer bounds. rng may be a np.random.Generator or a
+    seed."""
+
+    rng = np.random.default_rng(rng)
+    factors = np.exp(rng.uniform(-scale, scale, len(hyperparameters)))
+    perturbed = np.array(hyperparameters) * factors
+
+    if bounds is not None:
+        for n, (lower, upper) in enumerate(bounds):
+            if lower is not None:
+                perturbed[n] = max(perturbed[n], lower)
+            if upper is not None:
+                perturbed[n] = min(perturbed[n], upper)
+
+    return perturbed
 
 
 def optimize_hyperparameters(
@@ -630,12 +830,54 @@ def optimize_hyperparameters(
     gradient_tolerance=1e-4,
     max_iterations=10,
     bounds=None,
-    method="BFGS",
+    method="L-BFGS-B",
+    stable=True,
+    n_restarts=1,
+    restart_scale=1.0,
+    backend="cpp",
+    likelihood_cache=None,
+    rng=None,
 ):
-    """Optimize the hyperparameters of a sparse GP model."""
+    """Optimize the hyperparameters of a sparse GP model. If stable is True,
+    the likelihood gradient is computed from the Sigma matrix, which scales
+    as O(N_full * N_sparse^2) rather than O(N_full^3). If n_restarts > 1, the
+    optimization is repeated from random perturbations of the current
+    hyperparameters (within a factor of exp(restart_scale)), drawn from rng
+    (a np.random.Generator or a seed), and the run with the highest
+    likelihood is kept. If backend is "jax", the likelihood and
+    its gradient are evaluated with JAX and the restarts are run together
+    with BFGS (dot product kernels only; method and bounds are ignored).
+    If likelihood_cache is an OrderedDict, likelihood evaluations are stored
+    in it and reused by later calls at the same hyperparameters."""
+
+    # Copy the hyperparameters, since the binding returns a view of the C++
+    # vector that changes with every evaluation.
+    initial_guess = np.array(sparse_gp.hyperparameters)
+
+    # The first run starts from the current hyperparameters, and any
+    # additional restarts from random log-uniform perturbations of them.
+    rng = np.random.default_rng(rng)
+    initial_guesses = [initial_guess]
+    for _ in range(n_restarts - 1):
+        initial_guesses.append(
+            perturb_hyperparameters(initial_guess, bounds, restart_scale, rng)
+        )
+
+    if backend == "jax":
+        from .jax_likelihood import optimize_hyperparameters_jax
+
+        optimization_result = optimize_hyperparameters_jax(
+            sparse_gp, initial_guesses, gradient_tolerance, max_iterations
+        )
+        sparse_gp.set_hyperparameters(optimization_result.x)
+        sparse_gp.likelihood_gradient = -optimization_result.jac
+        sparse_gp.log_marginal_likelihood = -optimization_result.fun
+        return optimization_result
+    elif backend != "cpp":
+        raise NotImplementedError(f"Backend {backend} is not supported")
 
-    initial_guess = sparse_gp.hyperparameters
-    precompute = True
+    # KnK is only used by the stable likelihood gradient.
+    precompute = stable and (method in ["BFGS", "L-BFGS-B"])
     for kern in sparse_gp.kernels:
         if not isinstance(kern, (NormalizedDotProduct, DotProduct)):
             precompute = False
@@ -645,56 +887,154 @@ def optimize_hyperparameters(
         print("Precomputing KnK for hyps optimization")
         sparse_gp.precompute_KnK()
         print("Done precomputing. Time:", time() - tic)
-        arguments = (sparse_gp, precompute)
+
+    # Extra arguments passed to each objective after the hyperparameters.
+    if stable:
+        likelihood_grad = compute_negative_likelihood_grad_stable
+        grad_arguments = (sparse_gp, precompute)
     else:
-        arguments = (sparse_gp, precompute)
-
-    if method == "BFGS":
-        optimization_result = minimize(
-            compute_negative_likelihood_grad_stable,
-            initial_guess,
-            arguments,
-            method="BFGS",
-            jac=True,
-            options={
-                "disp": display_results,
-                "gtol": gradient_tolerance,
-                "maxiter": max_iterations,
-            },
+        likelihood_grad = compute_negative_likelihood_grad
+        grad_arguments = (sparse_gp,)
+    likelihood_arguments = (sparse_gp,)
+
+    # Store the most recent evaluation. Repeated calls at the same point (e.g.
+    # during line search) return the cached values instead of recomputing the
+    # likelihood gradient. The likelihood gradient stored on the C++ sparse GP
+    # is always the one from this point. Its hyperparameters are only moved
+    # there by the stable path, which calls set_hyperparameters.
+    last_evaluation = {"hyperparameters": None}
+
+    def evaluate(hyperparameters, *args):
+        key = np.asarray(hyperparameters, dtype=np.float64).tobytes()
+        negative_likelihood, negative_likelihood_gradient = likelihood_grad(
+            hyperparameters, *args
         )
+        last_evaluation["hyperparameters"] = key
+        last_evaluation["likelihood"] = negative_likelihood
+        last_evaluation["gradient"] = negative_likelihood_gradient
+
+        if likelihood_cache is not None:
+            cache_key = (key, sparse_gp.n_labels, sparse_gp.n_sparse)
+            likelihood_cache[cache_key] = (
+                negative_likelihood,
+                negative_likelihood_gradient,
+            )
+            likelihood_cache.move_to_end(cache_key)
+            if len(likelihood_cache) > likelihood_cache_size:
+                likelihood_cache.popitem(last=False)
+
+        return negative_likelihood, negative_likelihood_gradient
+
+    def objective(hyperparameters, *args):
+        key = np.asarray(hyperparameters, dtype=np.float64).tobytes()
+        if key == last_evaluation["hyperparameters"]:
+            return last_evaluation["likelihood"], last_evaluation["gradient"]
+
+        # Check the cache shared across calls, keyed by the hyperparameters
+        # and the size of the training set. A hit does not touch the C++
+        # sparse GP, so last_evaluation is left unchanged.
+        cache_key = (key, sparse_gp.n_labels, sparse_gp.n_sparse)
+        if (likelihood_cache is not None) and (cache_key in likelihood_cache):
+            likelihood_cache.move_to_end(cache_key)
+            return likelihood_cache[cache_key]
+
+        return evaluate(hyperparameters, *args)
+
+    # Skip the optimizer if the current hyperparameters are already converged
+    # (e.g. when retraining after a small change to the training set). The
+    # evaluation is cached, so it is not repeated by the optimizer otherwise.
+    if (method in ["BFGS", "L-BFGS-B"]) and (n_restarts == 1):
+        negative_likelihood, negative_likelihood_gradient = objective(
+            initial_guess, *grad_arguments
+        )
+        if np.linalg.norm(negative_likelihood_gradient, np.inf) < gradient_tolerance:
+            sparse_gp.likelihood_gradient = -negative_likelihood_gradient
+            sparse_gp.log_marginal_likelihood = -negative_likelihood
+            return OptimizeResult(
+                x=np.array(initial_guess),
+                fun=negative_likelihood,
+                jac=negative_likelihood_gradient,
+                nit=0,
+                nfev=1,
+                success=True,
+                message="Initial gradient below tolerance",
+            )
 
-        # Assign likelihood gradient.
-        sparse_gp.likelihood_gradient = -optimization_result.jac
+    optimization_result = None
+    for guess in initial_guesses:
+        if method == "BFGS":
+            result = minimize(
+                objective,
+                guess,
+                grad_arguments,
+                method="BFGS",
+                jac=True,
+                options={
+                    "disp": display_results,
+                    "gtol": gradient_tolerance,
+                    "maxiter": max_iterations,
+                },
+            )
 
-    elif method == "L-BFGS-B":
-        optimization_result = minimize(
-            compute_negative_likelihood_grad_stable,
-            initial_guess,
-            arguments,
-            method="L-BFGS-B",
-            jac=True,
-            bounds=bounds,
-            options={
-                "disp": display_results,
-                "gtol": gradient_tolerance,
-                "maxiter": max_iterations,
-            },
-        )
+        elif method == "L-BFGS-B":
+            result = minimize(
+                objective,
+                guess,
+                grad_arguments,
+                method="L-BFGS-B",
+                jac=True,
+                bounds=bounds,
+                options={
+                    "disp": display_results,
+                    "gtol": gradient_tolerance,
+                    "maxiter": max_iterations,
+                    "maxcor": 10,
+                },
+            )
 
-        # Assign likelihood gradient.
-        sparse_gp.likelihood_gradient = -optimization_result.jac
+        # L-BFGS-B with a finite-difference gradient, for kernels without an
+        # analytic likelihood gradient.
+        elif method == "lbfgs-fd":
+            result = minimize(
+                compute_negative_likelihood,
+                guess,
+                likelihood_arguments,
+                method="L-BFGS-B",
+                jac="2-point",
+                bounds=bounds,
+                options={
+                    "disp": display_results,
+                    "gtol": gradient_tolerance,
+                    "maxiter": max_iterations,
+                },
+            )
 
-    elif method == "nelder-mead":
-        optimization_result = minimize(
-            compute_negative_likelihood,
-            initial_guess,
-            arguments,
-            method="nelder-mead",
-            options={
-                "disp": display_results,
-                "maxiter": max_iterations,
-            },
-        )
+        elif method == "nelder-mead":
+            result = minimize(
+                compute_negative_likelihood,
+                guess,
+                likelihood_arguments,
+                method="nelder-mead",
+                options={
+                    "disp": display_results,
+                    "maxiter": max_iterations,
+                },
+            )
+
+        else:
+            raise NotImplementedError(f"Optimization method {method} is not supported")
+
+        # Keep the run with the lowest negative likelihood.
+        if (optimization_result is None) or (result.fun < optimization_result.fun):
+            optimization_result = result
+
+    # The likelihood gradient of the sparse GP is left over from the last
+    # evaluation. Recompute it if that was not at the optimum, e.g. if the
+    # line search finished elsewhere or an earlier restart was kept.
+    if method in ["BFGS", "L-BFGS-B"]:
+        key = np.asarray(optimization_result.x, dtype=np.float64).tobytes()
+        if key != last_evaluation["hyperparameters"]:
+            evaluate(optimization_result.x, *grad_arguments)
 
     # Set the hyperparameters to the optimal value.
     sparse_gp.set_hyperparameters(optimization_result.x)
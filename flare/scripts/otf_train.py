@@ -209,7 +209,7 @@ def get_sgp_calc(flare_config):
         return flare_calc, kernels
 
     kernels = flare_config.get("kernels")
-    opt_algorithm = flare_config.get("opt_algorithm", "BFGS")
+    opt_algorithm = flare_config.get("opt_algorithm", "L-BFGS-B")
     max_iterations = flare_config.get("max_iterations", 20)
     bounds = flare_config.get("bounds", None)
     use_mapping = flare_config.get("use_mapping", False)
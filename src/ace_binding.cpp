@@ -16,6 +16,7 @@
 #include "norm_dot_icm.h"
 
 #include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
@@ -29,9 +30,24 @@ PYBIND11_MODULE(_C_flare, m) {
   py::class_<Structure>(m, "Structure")
       .def(py::init<const Eigen::MatrixXd &, const std::vector<int> &,
                     const Eigen::MatrixXd &>())
+      // Accept species as a contiguous int32 array without converting each
+      // element to a Python int. Registered before the std::vector overload so
+      // that NumPy arrays match it first.
+      .def(py::init([](const Eigen::MatrixXd &cell,
+                       py::array_t<int, py::array::c_style> species,
+                       const Eigen::MatrixXd &positions, double cutoff,
+                       std::vector<Descriptor *> descriptor_calculators) {
+             const int *data = species.data();
+             std::vector<int> species_vector(data, data + species.size());
+             // Release the GIL while the descriptors are computed.
+             py::gil_scoped_release release;
+             return Structure(cell, species_vector, positions, cutoff,
+                              descriptor_calculators);
+           }))
       .def(py::init<const Eigen::MatrixXd &, const std::vector<int> &,
                     const Eigen::MatrixXd &, double,
-                    std::vector<Descriptor *>>())
+                    std::vector<Descriptor *>>(),
+           py::call_guard<py::gil_scoped_release>())
       .def_readwrite("noa", &Structure::noa)
       .def_readwrite("cell", &Structure::cell)
       .def_readwrite("species", &Structure::species)
@@ -187,6 +203,7 @@ PYBIND11_MODULE(_C_flare, m) {
                        py::arg("rel_f_noise") = 1.0,
                        py::arg("rel_s_noise") = 1.0)
       .def("update_matrices_QR", &SparseGP::update_matrices_QR)
+      .def("update_matrices_QR_append", &SparseGP::update_matrices_QR_append)
       .def("compute_likelihood", &SparseGP::compute_likelihood)
       .def("compute_likelihood_stable", &SparseGP::compute_likelihood_stable)
       .def("compute_likelihood_gradient",
@@ -219,6 +236,9 @@ PYBIND11_MODULE(_C_flare, m) {
       .def_readonly("energy_noise", &SparseGP::energy_noise)
       .def_readonly("stress_noise", &SparseGP::stress_noise)
       .def_readonly("noise_vector", &SparseGP::noise_vector)
+      .def_readonly("e_noise_one", &SparseGP::e_noise_one)
+      .def_readonly("f_noise_one", &SparseGP::f_noise_one)
+      .def_readonly("s_noise_one", &SparseGP::s_noise_one)
       .def_readonly("Kuu", &SparseGP::Kuu)
       .def_readonly("Kuu_kernels", &SparseGP::Kuu_kernels)
       .def_readonly("Kuf", &SparseGP::Kuf)
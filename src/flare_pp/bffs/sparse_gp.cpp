@@ -1,6 +1,7 @@
 #include "sparse_gp.h"
 #include <algorithm> // Random shuffle
 #include <chrono>
+#include <cmath>
 #include <fstream> // File operations
 #include <iomanip> // setprecision
 #include <iostream>
@@ -621,13 +622,60 @@ void SparseGP ::update_matrices_QR() {
 
   // QR decompose A.
   Eigen::HouseholderQR<Eigen::MatrixXd> qr(A);
-  Eigen::VectorXd Q_b = qr.householderQ().transpose() * b;
-  R_inv = qr.matrixQR().block(0, 0, Kuu.cols(), Kuu.cols())
-                       .triangularView<Eigen::Upper>()
-                       .solve(Kuu_eye);
+  // Only the top of Q^T b enters the solution. Keep it for later updates.
+  Q_b = qr.householderQ().transpose() * b;
+  Q_b.conservativeResize(Kuu.cols());
+  R = qr.matrixQR().block(0, 0, Kuu.cols(), Kuu.cols())
+          .triangularView<Eigen::Upper>();
+  R_inv = R.triangularView<Eigen::Upper>().solve(Kuu_eye);
   R_inv_diag = R_inv.diagonal();
   alpha = R_inv * Q_b;
   Sigma = R_inv * R_inv.transpose();
+
+  n_labels_QR = n_labels;
+  n_sparse_QR = n_sparse;
+  Kuu_jitter_QR = Kuu_jitter;
+}
+
+void SparseGP ::update_matrices_QR_append() {
+  // If the sparse set or Kuu jitter changed since the last QR decomposition,
+  // every row of A changed and a full update is needed.
+  if ((n_sparse_QR != n_sparse) || (n_labels_QR < 0) ||
+      (Kuu_jitter_QR != Kuu_jitter)) {
+    update_matrices_QR();
+    return;
+  }
+
+  // Each new label appends one row to A. Rotate it into R with a sequence of
+  // Givens rotations, applying the same rotations to Q^T b.
+  Eigen::VectorXd a;
+  for (int i = n_labels_QR; i < n_labels; i++) {
+    double noise_sqrt = sqrt(noise_vector(i));
+    a = noise_sqrt * Kuf.col(i);
+    double beta = noise_sqrt * y(i);
+
+    for (int j = 0; j < n_sparse; j++) {
+      if (a(j) == 0) continue;
+      double r = std::hypot(R(j, j), a(j));
+      double c = R(j, j) / r;
+      double s = a(j) / r;
+      for (int k = j; k < n_sparse; k++) {
+        double R_jk = R(j, k);
+        R(j, k) = c * R_jk + s * a(k);
+        a(k) = -s * R_jk + c * a(k);
+      }
+      double Q_b_j = Q_b(j);
+      Q_b(j) = c * Q_b_j + s * beta;
+      beta = -s * Q_b_j + c * beta;
+    }
+  }
+
+  Eigen::MatrixXd Kuu_eye = Eigen::MatrixXd::Identity(n_sparse, n_sparse);
+  R_inv = R.triangularView<Eigen::Upper>().solve(Kuu_eye);
+  R_inv_diag = R_inv.diagonal();
+  alpha = R_inv * Q_b;
+  Sigma = R_inv * R_inv.transpose();
+  n_labels_QR = n_labels;
 }
 
 void SparseGP ::predict_mean(Structure &test_structure) {
@@ -26,6 +26,13 @@ public:
   Eigen::MatrixXd Sigma, Kuu_inverse, R_inv, L_inv;
   Eigen::VectorXd alpha, R_inv_diag, L_diag;
 
+  // Triangular factor of the last QR decomposition, and the matching rows of
+  // Q^T b, used to append new labels with Givens rotations.
+  Eigen::MatrixXd R;
+  Eigen::VectorXd Q_b;
+  int n_labels_QR = -1, n_sparse_QR = -1;
+  double Kuu_jitter_QR = -1;
+
   // Training and sparse points.
   std::vector<ClusterDescriptor> sparse_descriptors;
   std::vector<Structure> training_structures;
@@ -70,6 +77,7 @@ public:
   void stack_Kuf();
 
   void update_matrices_QR();
+  void update_matrices_QR_append();
 
   void predict_mean(Structure &structure);
   void predict_SOR(Structure &structure);
@@ -5,6 +5,8 @@ from copy import deepcopy
 import json
 
 from flare.bffs.sgp import SGP_Wrapper
+from flare.bffs.sgp import sparse_gp as sparse_gp_module
+from flare.bffs.sgp.sparse_gp import optimize_hyperparameters, perturb_hyperparameters
 from flare.bffs.sgp.calculator import SGP_Calculator
 
 from flare.bffs.gp.calculator import FLARE_Calculator
@@ -44,6 +46,50 @@ def test_update_db(multicut):
     assert sgp.sparse_gp.Kuf.shape[1] == 1 + n_atoms * 3 + 6
 
 
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_update_db_batch(multicut):
+    """Check that adding a batch of structures gives the same covariance
+    matrices as adding them one at a time."""
+
+    structures, forces_list, energies, stresses = [], [], [], []
+    for _ in range(3):
+        training_structure = get_random_atoms()
+        training_structure.calc = LennardJones()
+        structures.append(training_structure)
+        forces_list.append(training_structure.get_forces())
+        energies.append(training_structure.get_potential_energy())
+        stresses.append(training_structure.get_stress())
+
+    sgp_batch = get_empty_sgp(multiple_cutoff=multicut)
+    sgp_batch.update_db_batch(structures, forces_list, energies, stresses)
+
+    sgp_serial = get_empty_sgp(multiple_cutoff=multicut)
+    for s in range(len(structures)):
+        sgp_serial.update_db(
+            structures[s], forces_list[s], (), energies[s], stresses[s], mode="all"
+        )
+
+    assert len(sgp_batch) == len(sgp_serial)
+    assert np.allclose(sgp_batch.sparse_gp.Kuu, sgp_serial.sparse_gp.Kuu)
+    assert np.allclose(sgp_batch.sparse_gp.Kuf, sgp_serial.sparse_gp.Kuf)
+    assert np.allclose(sgp_batch.sparse_gp.alpha, sgp_serial.sparse_gp.alpha)
+    assert np.allclose(sgp_batch.sparse_gp.Sigma, sgp_serial.sparse_gp.Sigma)
+
+
+@pytest.mark.parametrize("number", [7, 14])
+def test_update_db_unknown_species(number):
+    """Check that an atomic number missing from species_map is rejected."""
+
+    training_structure = get_random_atoms(numbers=[6, number])
+    training_structure.calc = LennardJones()
+    forces = training_structure.get_forces()
+
+    sgp = get_empty_sgp()
+    with pytest.raises(ValueError):
+        sgp.update_db(training_structure, forces, [1], mode="specific")
+    assert len(sgp) == 0
+
+
 @pytest.mark.parametrize("multicut", multiple_cutoff)
 def test_train(multicut):
     """Check that the hyperparameters and likelihood are updated when the
@@ -58,6 +104,39 @@ def test_train(multicut):
     assert sgp.likelihood != 0.0
 
 
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_train_unstable(multicut):
+    """Check that training with the O(N_full^3) likelihood gradient updates
+    the hyperparameters and matches the stable path's likelihood."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.stable = False
+    hyps_init = tuple(sgp.hyps)
+    sgp.train()
+    hyps_post = tuple(sgp.hyps)
+
+    assert hyps_init != hyps_post
+    likelihood = sgp.likelihood
+    sgp.sparse_gp.compute_likelihood()
+    assert np.isclose(likelihood, sgp.likelihood, rtol=1e-6)
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_train_likelihood_gradient(multicut):
+    """Check that the likelihood gradient stored after training is the
+    gradient at the optimized hyperparameters."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.train()
+    gradient = np.copy(sgp.likelihood_gradient)
+    likelihood = sgp.likelihood
+
+    hyps = np.array(sgp.hyps)
+    fresh_likelihood = sgp.sparse_gp.compute_likelihood_gradient(hyps)
+    assert np.allclose(gradient, sgp.likelihood_gradient, rtol=1e-4, atol=1e-8)
+    assert np.isclose(likelihood, fresh_likelihood, rtol=1e-6)
+
+
 @pytest.mark.parametrize("multicut", multiple_cutoff)
 def test_dict(multicut):
     """
@@ -133,3 +212,187 @@ def test_write_model(multicut):
     # Check that they're the same.
     max_abs_diff = np.max(np.abs(forces - forces_2))
     assert max_abs_diff < 1e-8
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_jax_likelihood(multicut):
+    """Check that the JAX likelihood matches the C++ likelihood, also when
+    the shared kernel object was changed by another model."""
+
+    pytest.importorskip("jax")
+    from jax.experimental import enable_x64
+    from flare.bffs.sgp.jax_likelihood import (
+        get_likelihood_inputs,
+        negative_likelihood,
+    )
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.sparse_gp.compute_likelihood()
+
+    # The kernels in get_sgp are shared, so this changes their sigma.
+    other_sgp = get_updated_sgp(multiple_cutoff=multicut)
+    other_hyps = np.array(other_sgp.hyps)
+    other_hyps[0] *= 2
+    other_sgp.sparse_gp.set_hyperparameters(other_hyps)
+
+    with enable_x64():
+        inputs = get_likelihood_inputs(sgp.sparse_gp)
+        neglike = float(negative_likelihood(np.array(sgp.hyps), inputs))
+
+    assert np.isclose(-neglike, sgp.likelihood, rtol=1e-6)
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_jax_backend(multicut):
+    """Check that the JAX backend improves the likelihood and writes the
+    likelihood and its gradient back to the sparse GP."""
+
+    pytest.importorskip("jax")
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.sparse_gp.compute_likelihood()
+    likelihood_init = sgp.likelihood
+
+    optimize_hyperparameters(sgp.sparse_gp, backend="jax", n_restarts=2, rng=0)
+    likelihood = sgp.likelihood
+    gradient = np.copy(sgp.likelihood_gradient)
+    assert likelihood >= likelihood_init
+
+    fresh_likelihood = sgp.sparse_gp.compute_likelihood_gradient(
+        np.array(sgp.hyps)
+    )
+    assert np.isclose(likelihood, fresh_likelihood, rtol=1e-6)
+    assert np.allclose(gradient, sgp.likelihood_gradient, rtol=1e-4, atol=1e-6)
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_update_matrices_QR_append(multicut):
+    """Check that appending labels to the QR factorization gives the same
+    solution as a full QR update."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    training_structure = get_random_atoms()
+    training_structure.calc = LennardJones()
+    forces = training_structure.get_forces()
+    energy = training_structure.get_potential_energy()
+
+    # Add a structure without new sparse environments.
+    sgp.update_db(training_structure, forces, [], energy, mode="specific")
+    alpha_append = np.copy(sgp.sparse_gp.alpha)
+    Sigma_append = np.copy(sgp.sparse_gp.Sigma)
+
+    sgp.flush()
+    assert np.allclose(alpha_append, sgp.sparse_gp.alpha)
+    assert np.allclose(Sigma_append, sgp.sparse_gp.Sigma)
+
+
+def test_perturb_hyperparameters():
+    """Check that perturbations are reproducible from a seed and clipped to
+    the bounds."""
+
+    hyps = np.array([1.0, 0.1, 0.2, 0.3])
+    bounds = [(0.5, 2.0), (None, 0.12), (0.19, None), (None, None)]
+
+    perturbed = perturb_hyperparameters(hyps, bounds, scale=3.0, rng=0)
+    assert np.allclose(perturbed, perturb_hyperparameters(hyps, bounds, 3.0, 0))
+    assert 0.5 <= perturbed[0] <= 2.0
+    assert perturbed[1] <= 0.12
+    assert perturbed[2] >= 0.19
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_restarts(multicut, monkeypatch):
+    """Check that the restart with the lowest negative likelihood is kept."""
+
+    results = []
+
+    def recorded_minimize(*args, **kwargs):
+        result = minimize(*args, **kwargs)
+        results.append(result)
+        return result
+
+    minimize = sparse_gp_module.minimize
+    monkeypatch.setattr(sparse_gp_module, "minimize", recorded_minimize)
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    bounds = [(1e-3, None)] * len(sgp.hyps)
+    result = optimize_hyperparameters(
+        sgp.sparse_gp, bounds=bounds, n_restarts=3, rng=0
+    )
+
+    assert len(results) == 3
+    assert result.fun == min(r.fun for r in results)
+    assert np.allclose(sgp.hyps, result.x)
+    assert np.all(result.x >= 1e-3)
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_lbfgs_fd(multicut):
+    """Check that finite-difference L-BFGS-B does not decrease the
+    likelihood."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.sparse_gp.compute_likelihood()
+    likelihood_init = sgp.likelihood
+
+    optimize_hyperparameters(sgp.sparse_gp, method="lbfgs-fd", max_iterations=5)
+    sgp.sparse_gp.compute_likelihood()
+
+    assert sgp.likelihood >= likelihood_init
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_likelihood_cache_cleared(multicut):
+    """Check that adding a structure clears the likelihood cache."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.train()
+    assert len(sgp._likelihood_cache) > 0
+
+    training_structure = get_random_atoms()
+    training_structure.calc = LennardJones()
+    forces = training_structure.get_forces()
+    sgp.update_db(training_structure, forces, [1], mode="specific")
+    assert len(sgp._likelihood_cache) == 0
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+def test_likelihood_cache_eviction(multicut, monkeypatch):
+    """Check that the oldest entries are evicted once the cache is full."""
+
+    monkeypatch.setattr(sparse_gp_module, "likelihood_cache_size", 2)
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    result = sgp.train()
+
+    assert result.nfev > 2
+    assert len(sgp._likelihood_cache) == 2
+
+    # The final hyperparameters are the most recent entry.
+    key = list(sgp._likelihood_cache)[-1]
+    assert key[0] == np.asarray(result.x, dtype=np.float64).tobytes()
+
+
+@pytest.mark.parametrize("multicut", multiple_cutoff)
+@pytest.mark.parametrize("stable", [True, False])
+def test_train_converged(multicut, stable):
+    """Check that retraining at a converged point skips the optimizer and
+    leaves the same likelihood and gradient as a fresh evaluation."""
+
+    sgp = get_updated_sgp(multiple_cutoff=multicut)
+    sgp.stable = stable
+    sgp.train()
+
+    # Retrain with a tolerance above the current gradient. The gradient is
+    # served from the likelihood cache.
+    tolerance = 2 * np.max(np.abs(sgp.likelihood_gradient)) + 1e-12
+    hyps = np.array(sgp.hyps)
+    result = sgp.train(gradient_tolerance=tolerance)
+
+    assert result.nit == 0
+    assert np.allclose(sgp.hyps, hyps)
+    gradient = np.copy(sgp.likelihood_gradient)
+    likelihood = sgp.likelihood
+
+    fresh_likelihood = sgp.sparse_gp.compute_likelihood_gradient(hyps)
+    assert np.isclose(likelihood, fresh_likelihood, rtol=1e-6)
+    assert np.allclose(gradient, sgp.likelihood_gradient, rtol=1e-4, atol=1e-8)